@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from heredity import (batched_probabilities, bitmask_probabilities,
+                      enumerate_probabilities, load_data,
+                      log_enumerate_probabilities, stream_probabilities,
+                      variable_elimination)
+
+# Exact methods suitable for scoring many families without further options
+ENGINES = {
+    "enumerate": enumerate_probabilities,
+    "stream": stream_probabilities,
+    "log": log_enumerate_probabilities,
+    "bitmask": bitmask_probabilities,
+    "batched": batched_probabilities,
+    "elimination": variable_elimination
+}
+
+
+def main():
+
+    # Check for proper usage
+    arguments = sys.argv[1:]
+    options = dict(zip(arguments[1::2], arguments[2::2]))
+    if (len(arguments) % 2 != 1
+            or len(options) != len(arguments) // 2
+            or not set(options) <= {"--method", "--processes"}):
+        sys.exit("Usage: python batch.py (directory | manifest) "
+                 "[--method method] [--processes processes]")
+    method = options.get("--method", "elimination")
+    if method not in ENGINES:
+        sys.exit(f"Method must be one of: {', '.join(ENGINES)}")
+    processes = options.get("--processes")
+    if processes is not None:
+        if not processes.isdigit() or int(processes) < 1:
+            sys.exit("Processes must be a positive integer")
+        processes = int(processes)
+
+    filenames = list_families(arguments[0])
+    start = time.perf_counter()
+    count = 0
+    for result in score_families(filenames, method, processes):
+        print(json.dumps(result), flush=True)
+        count += 1
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0
+    print(f"Scored {count} families in {elapsed:.2f} s "
+          f"({rate:.1f} families/sec)", file=sys.stderr)
+
+
+def list_families(source):
+    """
+    Return the CSV files to score: every `.csv` file in `source` if it is
+    a directory, otherwise the non-blank lines of the manifest file
+    `source`, relative to the manifest's directory.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, filename) for filename in os.listdir(source)
+            if filename.endswith(".csv")
+        )
+    with open(source) as f:
+        return [
+            os.path.join(os.path.dirname(source), line.strip())
+            for line in f if line.strip()
+        ]
+
+
+def score_families(filenames, method="elimination", processes=None):
+    """
+    Score every family CSV in `filenames` with the engine named `method`
+    across a pool of `processes` worker processes, yielding one result
+    dictionary per file in order as soon as it is ready.
+
+    Worker processes are reused across families, so lookup tables
+    compiled for one family are shared with every later family scored
+    by the same worker.
+    """
+    tasks = [(filename, method) for filename in filenames]
+    if processes == 1:
+        yield from map(score_family, tasks)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(score_family, tasks,
+                             chunksize=max(1, len(tasks) // 256))
+
+
+def score_family(task):
+    """
+    Return the result dictionary for one family CSV, holding either its
+    `probabilities` or the `error` that stopped it from being scored.
+    """
+    filename, method = task
+    try:
+        people = load_data(filename)
+        check_family(people)
+        probabilities = ENGINES[method](people)
+    except Exception as e:
+        # one bad family must not stop the rest of the batch
+        return {"file": filename, "error": f"{type(e).__name__}: {e}"}
+    return {"file": filename, "probabilities": probabilities}
+
+
+def check_family(people):
+    """
+    Raise `ValueError` unless every person's mother and father are both
+    blank or both names of people in the family.
+    """
+    for name, person in people.items():
+        parents = (person["mother"], person["father"])
+        if parents == (None, None):
+            continue
+        for parent in parents:
+            if parent not in people:
+                raise ValueError(
+                    f"{name} must have both parents in the family or neither"
+                )
+
+
+if __name__ == "__main__":
+    main()
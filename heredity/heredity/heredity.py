@@ -1,7 +1,14 @@
 import csv
+import functools
 import itertools
+import math
+import multiprocessing
+import os
+import random
 import sys
 
+import numpy as np
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -37,15 +44,79 @@ PROBS = {
 }
 
 
+METHODS = ("enumerate", "stream", "log", "bitmask", "batched", "log-batched",
+           "elimination", "likelihood", "gibbs")
+APPROXIMATE_METHODS = ("likelihood", "gibbs")
+SAMPLES = 10000
+CHAINS = 4
+BATCHES = 20
+
+
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    arguments = sys.argv[1:]
+    options = dict(zip(arguments[1::2], arguments[2::2]))
+    if (len(arguments) % 2 != 1
+            or len(options) != len(arguments) // 2
+            or not set(options) <= {"--method", "--samples", "--chains",
+                                    "--seed"}):
+        sys.exit("Usage: python heredity.py data.csv [--method method] "
+                 "[--samples samples] [--chains chains] [--seed seed]")
+    method = options.get("--method", "enumerate")
+    if method not in METHODS:
+        sys.exit(f"Method must be one of: {', '.join(METHODS)}")
+    for option in ("--samples", "--chains", "--seed"):
+        if option in options and not options[option].isdigit():
+            sys.exit(f"{option} must be a non-negative integer")
+    samples = int(options.get("--samples", SAMPLES))
+    chains = int(options.get("--chains", CHAINS))
+    seed = int(options["--seed"]) if "--seed" in options else None
+    if samples < 1 or chains < 1:
+        sys.exit("--samples and --chains must be positive")
+    people = load_data(arguments[0])
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    # Compute gene and trait probabilities for each person
+    errors = None
+    if method == "elimination":
+        probabilities = variable_elimination(people)
+    elif method == "stream":
+        probabilities = stream_probabilities(people)
+    elif method == "bitmask":
+        probabilities = bitmask_probabilities(people)
+    elif method == "log":
+        probabilities = log_enumerate_probabilities(people)
+    elif method == "batched":
+        probabilities = batched_probabilities(people)
+    elif method == "log-batched":
+        probabilities = batched_probabilities(people, log_space=True)
+    elif method in APPROXIMATE_METHODS:
+        probabilities, errors = approximate_probabilities(
+            people, method, samples, chains, seed
+        )
+    else:
+        probabilities = enumerate_probabilities(people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    error = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {error:.4f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a probability structure with every gene and trait
+    probability set to 0 for each person in `people`.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,6 +131,16 @@ def main():
         for person in people
     }
 
+
+def enumerate_probabilities(people):
+    """
+    Return normalized gene and trait probabilities for each person,
+    computed by enumerating every assignment of genes and traits.
+    """
+
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
@@ -83,15 +164,7 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -128,6 +201,50 @@ def powerset(s):
     ]
 
 
+def lazy_powerset(s):
+    """
+    Yield every possible subset of set s, one at a time.
+    """
+    s = list(s)
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
+
+
+def iter_assignments(people):
+    """
+    Yield every assignment of genes and traits consistent with the known
+    traits in `people`, one `(one_gene, two_genes, have_trait)` at a time.
+    People whose trait is known are never branched on.
+    """
+    names = set(people)
+    known_trait = {
+        person for person in names if people[person]["trait"] is True
+    }
+    unknown = {person for person in names if people[person]["trait"] is None}
+
+    for have_trait in lazy_powerset(unknown):
+        have_trait |= known_trait
+        for one_gene in lazy_powerset(names):
+            for two_genes in lazy_powerset(names - one_gene):
+                yield one_gene, two_genes, have_trait
+
+
+def stream_probabilities(people):
+    """
+    Return normalized gene and trait probabilities for each person, like
+    `enumerate_probabilities`, without ever holding more than one
+    assignment in memory.
+    """
+    probabilities = empty_probabilities(people)
+    for one_gene, two_genes, have_trait in iter_assignments(people):
+        p = joint_probability(people, one_gene, two_genes, have_trait)
+        update(probabilities, one_gene, two_genes, have_trait, p)
+    normalize(probabilities)
+    return probabilities
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -139,6 +256,27 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
+    result = 1
+    for x in joint_factors(people, one_gene, two_genes, have_trait):
+        result = result*x
+    return result
+
+
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Compute and return the natural logarithm of the joint probability
+    returned by `joint_probability`, summing the logarithms of each
+    person's factor so that deep pedigrees do not underflow.
+    """
+    return sum(safe_log(x) for x in
+               joint_factors(people, one_gene, two_genes, have_trait))
+
+
+def joint_factors(people, one_gene, two_genes, have_trait):
+    """
+    Return the list of per-person factors whose product is the joint
+    probability computed by `joint_probability`.
+    """
     prob_cache = []
     # sort people into people_with_parents and people_without_parents
     people_with_parents = {}
@@ -210,10 +348,7 @@ def joint_probability(people, one_gene, two_genes, have_trait):
 
     
     
-    result = 1
-    for x in prob_cache:
-        result = result*x
-    return result
+    return prob_cache
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
@@ -252,6 +387,724 @@ def normalize(probabilities):
             for k,v in itemvalues.items():
                 itemvalues[k] = v/sum_of_val
 
+
+def safe_log(x):
+    """
+    Return the natural logarithm of `x`, or negative infinity if `x` is 0.
+    """
+    return math.log(x) if x > 0 else -math.inf
+
+
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving log space.
+    """
+    if a == -math.inf:
+        return b
+    if b == -math.inf:
+        return a
+    larger, smaller = max(a, b), min(a, b)
+    return larger + math.log1p(math.exp(smaller - larger))
+
+
+def empty_log_probabilities(people):
+    """
+    Return a probability structure like `empty_probabilities` holding
+    logarithms, with every value set to negative infinity (log 0).
+    """
+    log_probabilities = empty_probabilities(people)
+    for values in log_probabilities.values():
+        for itemvalues in values.values():
+            for k in itemvalues:
+                itemvalues[k] = -math.inf
+    return log_probabilities
+
+
+def log_update(log_probabilities, one_gene, two_genes, have_trait, log_p):
+    """
+    Add to `log_probabilities` a new joint probability whose logarithm is
+    `log_p`, like `update` does for probabilities, using log-sum-exp.
+    """
+    for person, values in log_probabilities.items():
+        if person in one_gene:
+            gene = 1
+        elif person in two_genes:
+            gene = 2
+        else:
+            gene = 0
+        values["gene"][gene] = log_add(values["gene"][gene], log_p)
+        trait = person in have_trait
+        values["trait"][trait] = log_add(values["trait"][trait], log_p)
+
+
+def log_normalize(log_probabilities):
+    """
+    Update `log_probabilities` such that each distribution is converted
+    from logarithms to probabilities that sum to 1.
+    """
+    for values in log_probabilities.values():
+        for itemvalues in values.values():
+            total = -math.inf
+            for v in itemvalues.values():
+                total = log_add(total, v)
+            for k, v in itemvalues.items():
+                itemvalues[k] = math.exp(v - total)
+
+
+def log_enumerate_probabilities(people):
+    """
+    Return normalized gene and trait probabilities for each person, like
+    `stream_probabilities`, accumulating in log space.
+    """
+    log_probabilities = empty_log_probabilities(people)
+    for one_gene, two_genes, have_trait in iter_assignments(people):
+        log_p = log_joint_probability(people, one_gene, two_genes, have_trait)
+        log_update(log_probabilities, one_gene, two_genes, have_trait, log_p)
+    log_normalize(log_probabilities)
+    return log_probabilities
+
+
+class CompiledPedigree():
+    """
+    Pedigree compiled for fast evaluation of joint probabilities.
+
+    Each person is identified by their index in `names`, and sets of
+    people are bitmasks with bit `i` set for `names[i]`. Each person's
+    factor is looked up in a precomputed table indexed by their gene,
+    their mother's gene, their father's gene and their trait.
+    """
+
+    def __init__(self, people):
+        self.names = list(people)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.size = len(self.names)
+        self.everyone = (1 << self.size) - 1
+
+        # People without parents use their own index for both parents,
+        # with a table that does not depend on the parents' genes
+        self.mothers = []
+        self.fathers = []
+        self.tables = []
+        for i, name in enumerate(self.names):
+            mother, father = people[name]["mother"], people[name]["father"]
+            founder = mother is None and father is None
+            self.mothers.append(i if founder else self.index[mother])
+            self.fathers.append(i if founder else self.index[father])
+            self.tables.append(lookup_table(founder))
+
+        self.factors = list(zip(range(self.size), self.tables,
+                                self.mothers, self.fathers))
+
+        self.known_traits = 0
+        self.unknown_traits = 0
+        for i, name in enumerate(self.names):
+            if people[name]["trait"] is None:
+                self.unknown_traits |= 1 << i
+            elif people[name]["trait"]:
+                self.known_traits |= 1 << i
+
+    @staticmethod
+    def code(gene, mother_gene, father_gene, trait):
+        """
+        Return the lookup table position of one person's factor.
+        """
+        return ((gene * 3 + mother_gene) * 3 + father_gene) * 2 + trait
+
+    def genes(self, one_gene, two_genes):
+        """
+        Return everyone's number of gene copies, in index order.
+        """
+        return [((one_gene >> i) & 1) + 2 * ((two_genes >> i) & 1)
+                for i in range(self.size)]
+
+    def joint_probability(self, one_gene, two_genes, have_trait):
+        """
+        Return the joint probability of the assignment given by the
+        bitmasks `one_gene`, `two_genes` and `have_trait`.
+        """
+        return self.gene_probability(self.genes(one_gene, two_genes),
+                                     have_trait)
+
+    def gene_probability(self, genes, have_trait):
+        """
+        Return the joint probability of everyone having `genes` copies
+        of the gene, in index order, and the traits in `have_trait`.
+        """
+        p = 1
+        for i, table, mother, father in self.factors:
+            p *= table[((genes[i] * 3 + genes[mother]) * 3
+                        + genes[father]) * 2 + ((have_trait >> i) & 1)]
+        return p
+
+    def assignments(self):
+        """
+        Yield every bitmask assignment consistent with the known traits.
+        """
+        for have_trait in submasks(self.unknown_traits):
+            have_trait |= self.known_traits
+            for one_gene in range(self.everyone + 1):
+                for two_genes in submasks(self.everyone & ~one_gene):
+                    yield one_gene, two_genes, have_trait
+
+
+def submasks(mask):
+    """
+    Yield every bitmask whose set bits are a subset of those in `mask`.
+    """
+    submask = mask
+    while True:
+        yield submask
+        if submask == 0:
+            return
+        submask = (submask - 1) & mask
+
+
+def bitmask_probabilities(people):
+    """
+    Return normalized gene and trait probabilities for each person,
+    computed by enumerating assignments as bitmasks over a
+    `CompiledPedigree`.
+    """
+    pedigree = CompiledPedigree(people)
+    genes = [[0, 0, 0] for _ in range(pedigree.size)]
+    traits = [[0, 0] for _ in range(pedigree.size)]
+    for one_gene, two_genes, have_trait in pedigree.assignments():
+        gene_codes = pedigree.genes(one_gene, two_genes)
+        p = pedigree.gene_probability(gene_codes, have_trait)
+        for i, gene in enumerate(gene_codes):
+            genes[i][gene] += p
+            traits[i][(have_trait >> i) & 1] += p
+
+    probabilities = empty_probabilities(people)
+    for i, name in enumerate(pedigree.names):
+        for gene in range(3):
+            probabilities[name]["gene"][gene] = genes[i][gene]
+        for trait in (False, True):
+            probabilities[name]["trait"][trait] = traits[i][trait]
+    normalize(probabilities)
+    return probabilities
+
+
+BLOCK_SIZE = 1 << 16
+
+
+def batched_probabilities(people, block_size=BLOCK_SIZE, log_space=False):
+    """
+    Return normalized gene and trait probabilities for each person,
+    computed by evaluating blocks of `block_size` assignments at a time
+    as arrays of gene and trait codes over a `CompiledPedigree`.
+
+    With `log_space`, joint probabilities are summed as logarithms and
+    accumulated with log-sum-exp so that deep pedigrees do not underflow.
+    """
+    pedigree = CompiledPedigree(people)
+    size = pedigree.size
+    people_range = np.arange(size)
+    tables = np.array(pedigree.tables)
+    if log_space:
+        with np.errstate(divide="ignore"):
+            tables = np.log(tables)
+    mothers = np.array(pedigree.mothers)
+    fathers = np.array(pedigree.fathers)
+    unknown = [i for i in range(size) if (pedigree.unknown_traits >> i) & 1]
+    known = np.array([(pedigree.known_traits >> i) & 1 for i in range(size)])
+
+    # Assignment k has gene code (k // 2^U // 3^i) % 3 for person i and
+    # trait bit (k // 2^j) % 2 for the j-th person with an unknown trait
+    gene_place = 3 ** people_range
+    trait_count = 2 ** len(unknown)
+    total = 3 ** size * trait_count
+
+    empty = -np.inf if log_space else 0.0
+    genes_total = np.full(size * 3, empty)
+    traits_total = np.full(size * 2, empty)
+    for start in range(0, total, block_size):
+        k = np.arange(start, min(start + block_size, total))
+        genes = (k[:, np.newaxis] // trait_count // gene_place) % 3
+        traits = np.tile(known, (len(k), 1))
+        for j, i in enumerate(unknown):
+            traits[:, i] = (k >> j) & 1
+
+        codes = (((genes * 3 + genes[:, mothers]) * 3 + genes[:, fathers])
+                 * 2 + traits)
+        factors = tables[people_range, codes]
+
+        # Scatter every assignment's probability into each person's totals,
+        # in log space relative to the block's largest joint probability
+        if log_space:
+            log_p = factors.sum(axis=1)
+            shift = log_p.max()
+            if shift == -np.inf:
+                continue
+            weights = np.repeat(np.exp(log_p - shift), size)
+        else:
+            weights = np.repeat(factors.prod(axis=1), size)
+        gene_sums = np.bincount((people_range * 3 + genes).ravel(),
+                                weights=weights, minlength=size * 3)
+        trait_sums = np.bincount((people_range * 2 + traits).ravel(),
+                                 weights=weights, minlength=size * 2)
+        if log_space:
+            with np.errstate(divide="ignore"):
+                genes_total = np.logaddexp(genes_total,
+                                           np.log(gene_sums) + shift)
+                traits_total = np.logaddexp(traits_total,
+                                            np.log(trait_sums) + shift)
+        else:
+            genes_total += gene_sums
+            traits_total += trait_sums
+
+    if log_space:
+        genes_total = genes_total.reshape(size, 3)
+        traits_total = traits_total.reshape(size, 2)
+        genes_total = np.exp(genes_total - np.logaddexp.reduce(
+            genes_total, axis=1, keepdims=True)).ravel()
+        traits_total = np.exp(traits_total - np.logaddexp.reduce(
+            traits_total, axis=1, keepdims=True)).ravel()
+
+    probabilities = empty_probabilities(people)
+    for i, name in enumerate(pedigree.names):
+        for gene in range(3):
+            probabilities[name]["gene"][gene] = float(genes_total[i * 3 + gene])
+        for trait in (False, True):
+            probabilities[name]["trait"][trait] = float(
+                traits_total[i * 2 + trait]
+            )
+    if not log_space:
+        normalize(probabilities)
+    return probabilities
+
+
+def inheritance_probability(gene, mother_gene, father_gene):
+    """
+    Return the probability that a child has `gene` copies of the gene,
+    given how many copies their mother and father have.
+    """
+    passing = {
+        2: 1 - PROBS["mutation"],
+        1: 0.5,
+        0: PROBS["mutation"]
+    }
+    mother_prob = passing[mother_gene]
+    father_prob = passing[father_gene]
+    if gene == 2:
+        return mother_prob * father_prob
+    elif gene == 1:
+        return (mother_prob * (1 - father_prob)
+                + father_prob * (1 - mother_prob))
+    return (1 - mother_prob) * (1 - father_prob)
+
+
+def evidence_likelihood(trait, gene):
+    """
+    Return the probability of the observed `trait` (or 1 if it is not
+    known) given `gene` copies of the gene.
+    """
+    if trait is None:
+        return 1
+    return PROBS["trait"][gene][trait]
+
+
+def compile_factors(people):
+    """
+    Return a list of factors for the pedigree in `people`, one per person.
+
+    Each factor is a tuple `(variables, table)` where `variables` is a
+    tuple of names and `table` is an array with one axis of length 3 per
+    variable, indexed by that person's number of copies of the gene.
+    Observed traits are folded into the factor of the person they belong
+    to, so unobserved traits never appear as variables.
+    """
+    factors = []
+    for person, values in people.items():
+        mother, father = values["mother"], values["father"]
+        if mother is None and father is None:
+            factors.append(((person,), factor_table(True, values["trait"])))
+        else:
+            factors.append(((person, mother, father),
+                            factor_table(False, values["trait"])))
+    return factors
+
+
+@functools.lru_cache(maxsize=None)
+def factor_table(founder, trait):
+    """
+    Return the read-only gene factor for a person with or without parents
+    whose trait is `trait` (or `None` if unknown). Tables are computed
+    once and shared by every pedigree.
+    """
+    if founder:
+        table = np.array([
+            PROBS["gene"][gene] * evidence_likelihood(trait, gene)
+            for gene in range(3)
+        ])
+    else:
+        table = np.empty((3, 3, 3))
+        for gene, mother_gene, father_gene in itertools.product(
+                range(3), repeat=3):
+            table[gene, mother_gene, father_gene] = (
+                inheritance_probability(gene, mother_gene, father_gene)
+                * evidence_likelihood(trait, gene)
+            )
+    table.flags.writeable = False
+    return table
+
+
+@functools.lru_cache(maxsize=None)
+def lookup_table(founder):
+    """
+    Return the `CompiledPedigree` lookup table for a person with or
+    without parents, indexed by `CompiledPedigree.code`. Tables are
+    computed once and shared by every pedigree.
+    """
+    table = [0] * 54
+    for gene, mother_gene, father_gene, trait in itertools.product(
+            range(3), range(3), range(3), (False, True)):
+        gene_prob = (PROBS["gene"][gene] if founder else
+                     inheritance_probability(gene, mother_gene, father_gene))
+        table[CompiledPedigree.code(gene, mother_gene, father_gene, trait)] = (
+            gene_prob * PROBS["trait"][gene][trait]
+        )
+    return tuple(table)
+
+
+def multiply_factors(factors):
+    """
+    Return the product of a list of factors as a single factor.
+    """
+    variables = []
+    for factor_variables, _ in factors:
+        for variable in factor_variables:
+            if variable not in variables:
+                variables.append(variable)
+
+    table = np.ones((1,) * len(variables))
+    for factor_variables, factor_table in factors:
+        # line the factor's axes up with `variables`, broadcasting the rest
+        order = sorted(range(len(factor_variables)),
+                       key=lambda axis: variables.index(factor_variables[axis]))
+        shape = [3 if variable in factor_variables else 1
+                 for variable in variables]
+        table = table * factor_table.transpose(order).reshape(shape)
+    return tuple(variables), table
+
+
+def sum_out(factor, variable):
+    """
+    Return `factor` with `variable` summed out, rescaled so that its
+    largest entry is 1 to keep deep pedigrees from underflowing.
+    """
+    variables, table = factor
+    axis = variables.index(variable)
+    table = table.sum(axis=axis)
+    largest = table.max() if table.size else 0
+    if largest > 0:
+        table = table / largest
+    return variables[:axis] + variables[axis + 1:], table
+
+
+def elimination_order(factors):
+    """
+    Return an order in which to eliminate every variable in `factors`,
+    greedily choosing the variable whose elimination adds the fewest new
+    edges between its neighbours (min-fill), breaking ties by name.
+    """
+    neighbours = {}
+    for variables, _ in factors:
+        for variable in variables:
+            neighbours.setdefault(variable, set()).update(
+                set(variables) - {variable}
+            )
+
+    def fill(variable):
+        return sum(
+            1 for a, b in itertools.combinations(neighbours[variable], 2)
+            if b not in neighbours[a]
+        )
+
+    scores = {variable: fill(variable) for variable in neighbours}
+    order = []
+    while scores:
+        variable = min(scores, key=lambda v: (scores[v], len(neighbours[v]), v))
+        for a, b in itertools.combinations(neighbours[variable], 2):
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+        for neighbour in neighbours[variable]:
+            neighbours[neighbour].discard(variable)
+
+        # Only the fill of variables next to the eliminated one can change
+        affected = set(neighbours[variable])
+        for neighbour in neighbours[variable]:
+            affected.update(neighbours[neighbour])
+        del neighbours[variable], scores[variable]
+        for neighbour in affected - {variable}:
+            scores[neighbour] = fill(neighbour)
+        order.append(variable)
+    return order
+
+
+def gene_marginal(factors, person, order, cache=None):
+    """
+    Return the posterior distribution over `person`'s number of copies of
+    the gene as an array of length 3, by eliminating every other variable
+    in `order`.
+
+    If given, `cache` maps each elimination to the factor it produced,
+    keyed by the variable eliminated and the factors combined, so that
+    sub-families not involving `person` are summed out only once across
+    every query sharing the same `factors` and `cache`.
+    """
+    if cache is None:
+        cache = {}
+
+    # Index factors by the variables they mention so each elimination
+    # only touches the factors it needs
+    factors = dict(enumerate(factors))
+    mentions = {}
+    for i, (variables, _) in factors.items():
+        for variable in variables:
+            mentions.setdefault(variable, set()).add(i)
+    first_id = len(factors)
+
+    for variable in order:
+        if variable == person:
+            continue
+        related = mentions.pop(variable)
+        key = (variable, tuple(sorted(related)))
+        if key not in cache:
+            product = multiply_factors([factors[i] for i in related])
+            cache[key] = (first_id + len(cache), sum_out(product, variable))
+        i, factor = cache[key]
+        for j in related:
+            for other in factors.pop(j)[0]:
+                if other != variable:
+                    mentions[other].discard(j)
+        factors[i] = factor
+        for other in factor[0]:
+            mentions[other].add(i)
+    _, table = multiply_factors(list(factors.values()))
+    table = table.reshape(3)
+    return table / table.sum()
+
+
+def connected_families(factors):
+    """
+    Return the factors split into lists, one per group of people
+    connected through parent links. Groups are independent of each
+    other and can be solved separately.
+    """
+    parent = {}
+
+    def find(variable):
+        while parent.setdefault(variable, variable) != variable:
+            parent[variable] = parent[parent[variable]]
+            variable = parent[variable]
+        return variable
+
+    for variables, _ in factors:
+        for variable in variables[1:]:
+            parent[find(variable)] = find(variables[0])
+
+    families = {}
+    for factor in factors:
+        families.setdefault(find(factor[0][0]), []).append(factor)
+    return list(families.values())
+
+
+def variable_elimination(people):
+    """
+    Return normalized gene and trait probabilities for each person,
+    computed exactly by variable elimination over the pedigree.
+    """
+    probabilities = empty_probabilities(people)
+    for factors in connected_families(compile_factors(people)):
+        order = elimination_order(factors)
+        cache = {}
+        for variables, _ in factors:
+            person = variables[0]
+            marginal = gene_marginal(factors, person, order, cache)
+            for gene in range(3):
+                probabilities[person]["gene"][gene] = float(marginal[gene])
+
+            # An observed trait is certain; otherwise it follows from the gene
+            trait = people[person]["trait"]
+            if trait is None:
+                have_trait = sum(marginal[gene] * PROBS["trait"][gene][True]
+                                 for gene in range(3))
+            else:
+                have_trait = 1 if trait else 0
+            probabilities[person]["trait"][True] = float(have_trait)
+            probabilities[person]["trait"][False] = float(1 - have_trait)
+    return probabilities
+
+
+def approximate_probabilities(people, method="likelihood", samples=SAMPLES,
+                              chains=CHAINS, seed=None):
+    """
+    Return approximate gene and trait probabilities for each person by
+    Monte Carlo sampling, together with their standard errors.
+
+    `method` is "likelihood" for likelihood-weighted sampling or "gibbs"
+    for Gibbs sampling over genes. `samples` are split across `chains`
+    independent chains run in a process pool; chain `i` is seeded with
+    `seed + i` when `seed` is given. Each chain's samples are grouped into
+    `BATCHES` batches, and the standard error is estimated from the spread
+    of the batch estimates across all chains.
+
+    Return a tuple `(probabilities, errors)` of dictionaries shaped like
+    the result of `enumerate_probabilities`.
+    """
+    if method not in APPROXIMATE_METHODS:
+        raise ValueError(f"unknown method {method!r}")
+    tasks = [
+        (people, method, samples // chains + (i < samples % chains),
+         None if seed is None else seed + i)
+        for i in range(chains)
+    ]
+    if chains == 1:
+        results = [_run_chain(tasks[0])]
+    else:
+        with multiprocessing.Pool(min(chains, os.cpu_count() or 1)) as pool:
+            results = pool.map(_run_chain, tasks)
+
+    # Each batch contributes its estimate in proportion to its total weight
+    weights = np.array([weight for result in results
+                        for weight, _ in result if weight > 0])
+    estimates = np.array([estimate for result in results
+                          for weight, estimate in result if weight > 0])
+    shares = weights / weights.sum()
+    mean = np.tensordot(shares, estimates, axes=1)
+    if len(shares) > 1:
+        variance = (len(shares) / (len(shares) - 1) * np.tensordot(
+            shares ** 2, (estimates - mean) ** 2, axes=1
+        ))
+    else:
+        variance = np.zeros_like(mean)
+
+    probabilities = empty_probabilities(people)
+    errors = empty_probabilities(people)
+    for i, person in enumerate(people):
+        for column, (field, value) in enumerate(ESTIMATE_COLUMNS):
+            probabilities[person][field][value] = float(mean[i, column])
+            errors[person][field][value] = float(
+                math.sqrt(variance[i, column])
+            )
+    return probabilities, errors
+
+
+ESTIMATE_COLUMNS = [("gene", 2), ("gene", 1), ("gene", 0),
+                    ("trait", True), ("trait", False)]
+
+
+def topological_order(people):
+    """
+    Return the names in `people` ordered so that parents come before
+    their children.
+    """
+    order = []
+    placed = set()
+
+    def place(person):
+        if person in placed:
+            return
+        placed.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                place(parent)
+        order.append(person)
+
+    for person in people:
+        place(person)
+    return order
+
+
+def gene_distribution(people, person, genes):
+    """
+    Return the probability of each number of copies of the gene for
+    `person`, given the genes already chosen for their parents.
+    """
+    mother, father = people[person]["mother"], people[person]["father"]
+    if mother is None and father is None:
+        return [PROBS["gene"][gene] for gene in range(3)]
+    return [inheritance_probability(gene, genes[mother], genes[father])
+            for gene in range(3)]
+
+
+def _run_chain(task):
+    """
+    Run one sampling chain and return a list of `(weight, estimate)`
+    pairs, one per batch, where `estimate` is an array with one row per
+    person and one column per entry of `ESTIMATE_COLUMNS`.
+    """
+    people, method, samples, seed = task
+    rng = random.Random(seed)
+    names = list(people)
+    order = topological_order(people)
+    children = {person: [] for person in people}
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None and person not in children[parent]:
+                children[parent].append(person)
+
+    def forward_sample():
+        genes = {}
+        for person in order:
+            genes[person] = rng.choices(
+                range(3), gene_distribution(people, person, genes)
+            )[0]
+        return genes
+
+    def gibbs_sweep(genes):
+        for person in order:
+            # Weigh each gene by the person's own factor and their
+            # children's, which make up the rest of their Markov blanket
+            weights = []
+            for gene, prior in enumerate(gene_distribution(people, person,
+                                                           genes)):
+                genes[person] = gene
+                weight = prior * evidence_likelihood(people[person]["trait"],
+                                                     gene)
+                for child in children[person]:
+                    weight *= gene_distribution(people, child,
+                                                genes)[genes[child]]
+                weights.append(weight)
+            genes[person] = rng.choices(range(3), weights)[0]
+
+    genes = forward_sample()
+    if method == "gibbs":
+        for _ in range(samples // 10):
+            gibbs_sweep(genes)
+
+    batches = []
+    batch_size = max(1, samples // BATCHES)
+    for start in range(0, samples, batch_size):
+        total = 0
+        estimate = np.zeros((len(names), len(ESTIMATE_COLUMNS)))
+        for _ in range(min(batch_size, samples - start)):
+            if method == "gibbs":
+                gibbs_sweep(genes)
+                weight = 1
+            else:
+                genes = forward_sample()
+                weight = 1
+                for person in names:
+                    weight *= evidence_likelihood(people[person]["trait"],
+                                                  genes[person])
+            total += weight
+
+            # Unobserved traits use their exact probability given the gene
+            for i, person in enumerate(names):
+                gene = genes[person]
+                trait = people[person]["trait"]
+                have_trait = (PROBS["trait"][gene][True] if trait is None
+                              else float(trait))
+                estimate[i, 2 - gene] += weight
+                estimate[i, 3] += weight * have_trait
+                estimate[i, 4] += weight * (1 - have_trait)
+        if total > 0:
+            estimate /= total
+        batches.append((total, estimate))
+    return batches
+
             
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+import json
+import random
+import sys
+import time
+
+from logic import *
+
+CHARACTERS = [2, 4, 6, 8, 10, 20]
+SEED = 0
+# Clauses resolution_check may keep per query before giving up
+MAX_CLAUSES = 2000
+
+
+def main():
+    if len(sys.argv) > 1:
+        try:
+            sizes = [int(size) for size in sys.argv[1:]]
+        except ValueError:
+            sys.exit("Usage: python benchmark.py [characters ...]")
+    else:
+        sizes = CHARACTERS
+
+    # Print one JSON object per line so results can be compared across runs
+    for result in run(sizes):
+        print(json.dumps(result), flush=True)
+
+
+def run(sizes, seed=SEED):
+    """
+    Generate a Knights and Knaves puzzle for each number of characters
+    in `sizes`, ask every engine which characters are knights and which
+    are knaves, and yield one result dictionary per engine and puzzle.
+    The `knowledge_base` engine answers all of a puzzle's queries with
+    one incremental solver, while the others check each query afresh.
+    `model_check` only enumerates models up to `ENUMERATION_LIMIT`
+    symbols and uses `dpll_check` beyond that, which its result reports
+    as a `fallback`. `resolution_check` gives up on a query after keeping
+    `MAX_CLAUSES` clauses, and such queries are counted as `undecided`
+    and left out of `entailed` and `agrees`.
+    """
+    engines = [
+        ("model_check", check_each(model_check)),
+        ("resolution_check", check_each(
+            lambda knowledge, query:
+                resolution_check(knowledge, query, MAX_CLAUSES)
+        )),
+        ("dpll_check", check_each(dpll_check)),
+        ("knowledge_base", check_together)
+    ]
+    for size in sizes:
+        knowledge, symbols = generate_puzzle(size, random.Random(seed))
+        answers = None
+        for name, check in engines:
+            start = time.perf_counter()
+            entailed = check(knowledge, symbols)
+            seconds = time.perf_counter() - start
+            if answers is None:
+                answers = entailed
+            fallback = None
+            if name == "model_check" and len(symbols) > ENUMERATION_LIMIT:
+                fallback = "dpll_check"
+            yield {
+                "engine": name,
+                "fallback": fallback,
+                "characters": size,
+                "symbols": len(symbols),
+                "seconds": seconds,
+                "entailed": entailed.count(True),
+                "undecided": entailed.count(None),
+                "agrees": all(
+                    answer is None or answer == expected
+                    for answer, expected in zip(entailed, answers)
+                )
+            }
+
+
+def check_each(check):
+    """
+    Return an engine that asks `check` about each query separately.
+    """
+    return lambda knowledge, queries: [
+        check(knowledge, query) for query in queries
+    ]
+
+
+def check_together(knowledge, queries):
+    """
+    Answer every query against one shared `KnowledgeBase`.
+    """
+    knowledge_base = KnowledgeBase(knowledge)
+    return [knowledge_base.entails(query) for query in queries]
+
+
+def generate_puzzle(size, rng):
+    """
+    Return a knowledge base for a random puzzle with `size` characters,
+    each of whom says one thing about other characters, together with
+    the list of every character's knight and knave symbols.
+
+    Statements are made consistent with a hidden assignment of knights
+    and knaves, so the knowledge base is always satisfiable.
+    """
+    names = [f"Character {i}" for i in range(size)]
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+    is_knight = [rng.random() < 0.5 for _ in names]
+
+    def kind(i):
+        return knights[i] if is_knight[i] else knaves[i]
+
+    conjuncts = []
+    for i in range(size):
+        conjuncts.append(Or(knights[i], knaves[i]))
+        conjuncts.append(Not(And(knights[i], knaves[i])))
+
+        # Pick a true statement, then negate it if the speaker is a knave
+        j, k = rng.randrange(size), rng.randrange(size)
+        statement = rng.choice([
+            kind(j),
+            And(kind(j), kind(k)),
+            Or(kind(j), Not(kind(k))),
+            Biconditional(knights[j], knights[k])
+            if is_knight[j] == is_knight[k]
+            else Not(Biconditional(knights[j], knights[k]))
+        ])
+        if not is_knight[i]:
+            statement = Not(statement)
+        conjuncts.append(Biconditional(knights[i], statement))
+
+    symbols = [symbol for pair in zip(knights, knaves) for symbol in pair]
+    return And(*conjuncts), symbols
+
+
+if __name__ == "__main__":
+    main()
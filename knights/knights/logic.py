@@ -1,8 +1,36 @@
+import collections
+import heapq
 import itertools
+import multiprocessing
+import os
+import weakref
+
+# Knowledge bases with more symbols than this are checked with a SAT solver
+ENUMERATION_LIMIT = 20
+
+# Models each worker checks between looking for a counterexample elsewhere
+CHECK_BLOCK = 1 << 14
 
 
 class Sentence():
 
+    # Sentences are immutable and interned: structurally equal sentences
+    # share one node, so equality is identity and hashes are computed once
+    __slots__ = ("args", "_hash", "_symbols", "__weakref__")
+    nodes = weakref.WeakValueDictionary()
+
+    def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return self._hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError("logical sentences are immutable")
+
+    def __reduce__(self):
+        return (type(self), self.args)
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
@@ -13,7 +41,33 @@ class Sentence():
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self._symbols)
+
+    def source(self, index):
+        """
+        Returns a Python expression that evaluates the logical sentence
+        against a bitmask model `m`, where `index` maps each symbol name
+        to its bit.
+        """
+        raise Exception("nothing to compile")
+
+    @classmethod
+    def intern(cls, args, symbols=None, **fields):
+        """
+        Returns the one node of this class built from `args`, creating it
+        with the given named `fields` if no equal node exists yet.
+        """
+        key = (cls, args)
+        node = Sentence.nodes.get(key)
+        if node is None:
+            if symbols is None:
+                symbols = frozenset().union(*[arg._symbols for arg in args])
+            node = object.__new__(cls)
+            fields.update(args=args, _hash=hash(key), _symbols=symbols)
+            for name, value in fields.items():
+                object.__setattr__(node, name, value)
+            Sentence.nodes[key] = node
+        return node
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +97,10 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
-
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __new__(cls, name):
+        return cls.intern((name,), frozenset([name]), name=name)
 
     def __repr__(self):
         return self.name
@@ -65,20 +114,16 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def source(self, index):
+        return f"(m >> {index[self.name]} & 1)"
 
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
-
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    __slots__ = ("operand",)
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls.intern((operand,), operand=operand)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -89,23 +134,17 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def source(self, index):
+        return f"(not {self.operand.source(index)})"
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        return cls.intern(conjuncts, conjuncts=conjuncts)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,8 +153,8 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        raise TypeError("logical sentences are immutable; "
+                        "build a new And with every conjunct instead")
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
@@ -126,23 +165,21 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def source(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            conjunct.source(index) for conjunct in self.conjuncts
+        ) + ")"
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return cls.intern(disjuncts, disjuncts=disjuncts)
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -157,24 +194,22 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def source(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            disjunct.source(index) for disjunct in self.disjuncts
+        ) + ")"
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return cls.intern((antecedent, consequent),
+                          antecedent=antecedent, consequent=consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -188,24 +223,19 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def source(self, index):
+        antecedent = self.antecedent.source(index)
+        consequent = self.consequent.source(index)
+        return f"(not {antecedent} or {consequent})"
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return cls.intern((left, right), left=left, right=right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -221,44 +251,783 @@ class Biconditional(Sentence):
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
+    def source(self, index):
+        left = self.left.source(index)
+        right = self.right.source(index)
+        return f"((not {left}) == (not {right}))"
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-#                print(model)
-#                print(query.evaluate(model))
-                return query.evaluate(model)
-            return True #Knowledge Base and Query must both be true, else if KB is false, doesnt matter if query is true
-        else:
+def model_check(knowledge, query, processes=None):
+    """
+    Checks if knowledge base entails query.
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+    If `processes` is given, every model is enumerated across that many
+    worker processes, however many symbols there are.
+    """
+    if processes is not None:
+        return parallel_model_check(knowledge, query, processes)
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
+    # Get all symbols in both knowledge and query
+    symbols = set.union(knowledge.symbols(), query.symbols())
+    if len(symbols) > ENUMERATION_LIMIT:
+        return dpll_check(knowledge, query)
+
+    # Number the symbols so that each model is a bitmask
+    index = {name: i for i, name in enumerate(sorted(symbols))}
+    knowledge_holds = compile_sentence(knowledge, index)
+    query_holds = compile_sentence(query, index)
+
+    # Check that query is true in every model where knowledge base is true
+    for model in range(1 << len(symbols)):
+        if knowledge_holds(model) and not query_holds(model):
+            return False
+    return True
+
+
+def compile_sentence(sentence, index):
+    """
+    Returns a function that evaluates `sentence` against a bitmask model,
+    where `index` maps each symbol name to its bit.
+    """
+    try:
+        return eval(f"lambda m: {sentence.source(index)}")
+    except (RecursionError, SyntaxError, MemoryError):
+        # Sentences nested too deeply for the Python parser are evaluated
+        # by walking the tree instead
+        return lambda m: sentence.evaluate(
+            {name: bool(m >> bit & 1) for name, bit in index.items()}
+        )
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+def parallel_model_check(knowledge, query, processes=None, split=None):
+    """
+    Checks if knowledge base entails query by enumerating every model in
+    a pool of `processes` worker processes.
+
+    The models are split on the first `split` symbols into independent
+    subtrees, enough by default to give each process several of them.
+    Workers stop as soon as any of them finds a model where the
+    knowledge base holds but the query does not.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    processes = processes or os.cpu_count() or 1
+    if split is None:
+        split = (4 * processes - 1).bit_length()
+    split = max(0, min(split, len(symbols)))
+
+    # The split symbols take the highest bits, so each subtree is a
+    # contiguous range of bitmask models
+    index = {name: i for i, name in enumerate(reversed(symbols))}
+    size = 1 << (len(symbols) - split)
+    subtrees = [(prefix * size, size) for prefix in range(1 << split)]
+
+    found = multiprocessing.Event()
+    with multiprocessing.Pool(processes, _init_check_worker,
+                              (knowledge, query, index, found)) as pool:
+        for holds in pool.imap_unordered(_check_subtree, subtrees):
+            if not holds:
+                return False
+    return True
+
+
+def _init_check_worker(knowledge, query, index, found):
+    global _check_state
+    _check_state = (
+        compile_sentence(knowledge, index),
+        compile_sentence(query, index),
+        found
+    )
+
+
+def _check_subtree(subtree):
+    """
+    Returns whether the query holds in every model of the subtree
+    where the knowledge base holds, giving up early once any worker has
+    found a counterexample.
+    """
+    start, size = subtree
+    knowledge_holds, query_holds, found = _check_state
+    for block in range(start, start + size, CHECK_BLOCK):
+        if found.is_set():
+            return True
+        for model in range(block, min(block + CHECK_BLOCK, start + size)):
+            if knowledge_holds(model) and not query_holds(model):
+                found.set()
+                return False
+    return True
+
+
+class CNF():
+    """
+    Conjunctive normal form of a set of sentences.
+
+    Symbols are numbered from 1 and a literal is a variable number,
+    negated for a negative literal. Compound sentences are given new
+    variables equivalent to them (Tseitin encoding), so the clauses grow
+    linearly with the size of the sentences.
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.names = [None]
+        self.clauses = []
+        self.definitions = dict()
+
+    def variable(self, name):
+        """Returns the variable for the symbol called `name`."""
+        if name not in self.variables:
+            self.variables[name] = len(self.names)
+            self.names.append(name)
+        return self.variables[name]
+
+    def new_variable(self):
+        """Returns a new variable that stands for no symbol."""
+        self.names.append(None)
+        return len(self.names) - 1
+
+    def add(self, sentence):
+        """
+        Adds clauses asserting that `sentence` is true, and returns
+        the list of clauses added.
+        """
+        start = len(self.clauses)
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            )
+        else:
+            self.clauses.append([self.literal(sentence)])
+        return self.clauses[start:]
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to `sentence`, adding the clauses
+        that define it the first time a sentence is seen.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+
+        # Equal sentences are one interned node, so repeated subtrees
+        # are encoded once
+        if sentence in self.definitions:
+            return self.definitions[sentence]
+
+        if isinstance(sentence, And):
+            parts = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            result = self.new_variable()
+            self.clauses.extend([-result, part] for part in parts)
+            self.clauses.append([result] + [-part for part in parts])
+        elif isinstance(sentence, Or):
+            parts = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            result = self.new_variable()
+            self.clauses.extend([result, -part] for part in parts)
+            self.clauses.append([-result] + parts)
+        elif isinstance(sentence, Implication):
+            antecedent = self.literal(sentence.antecedent)
+            consequent = self.literal(sentence.consequent)
+            result = self.new_variable()
+            self.clauses.extend([
+                [-result, -antecedent, consequent],
+                [result, antecedent],
+                [result, -consequent]
+            ])
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            result = self.new_variable()
+            self.clauses.extend([
+                [-result, -left, right],
+                [-result, left, -right],
+                [result, left, right],
+                [result, -left, -right]
+            ])
+        else:
+            raise TypeError("must be a logical sentence")
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+        self.definitions[sentence] = result
+        return result
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Clauses are watched on two literals, so unit propagation only visits
+    clauses whose watched literal became false. Conflicts are analysed to
+    the first unique implication point and the learned clause is kept,
+    decisions follow variable activity, and the solver restarts on a
+    growing schedule.
+    """
+
+    def __init__(self, count=0, clauses=()):
+        self.count = 0
+        self.assignment = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.increment = 1.0
+
+        self.clauses = []
+        self.watches = dict()
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+        self.consistent = True
+
+        self.grow(count)
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def grow(self, count):
+        """Makes room for variables numbered up to `count`."""
+        while self.count < count:
+            self.count += 1
+            self.assignment.append(None)
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.watches[self.count] = []
+            self.watches[-self.count] = []
+
+    def value(self, literal):
+        """Returns whether `literal` is true, false, or None if unassigned."""
+        value = self.assignment[abs(literal)]
+        if value is None:
+            return None
+        return value if literal > 0 else not value
+
+    def add_clause(self, clause):
+        """
+        Adds a clause to the solver, simplifying it against the
+        assignments that hold without any decision.
+        """
+        self.backtrack(0)
+        self.grow(max((abs(literal) for literal in clause), default=0))
+        clause = list(dict.fromkeys(clause))
+        if any(-literal in clause for literal in clause):
+            return
+        if any(self.value(literal) is True for literal in clause):
+            return
+        clause = [literal for literal in clause
+                  if self.value(literal) is not False]
+
+        if not clause:
+            self.consistent = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            if self.propagate() is not None:
+                self.consistent = False
+        else:
+            self.attach(clause)
+
+    def attach(self, clause):
+        """Stores a clause of two or more literals, watching the first two."""
+        self.clauses.append(clause)
+        index = len(self.clauses) - 1
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def enqueue(self, literal, reason):
+        variable = abs(literal)
+        self.assignment[variable] = literal > 0
+        self.level[variable] = len(self.trail_limits)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns every literal implied by unit clauses, and returns the
+        index of a clause with every literal false, or None.
+        """
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watchers = self.watches[false_literal]
+            kept = []
+            for position, index in enumerate(watchers):
+                clause = self.clauses[index]
+
+                # Keep the false literal in the second position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) is True:
+                    kept.append(index)
+                    continue
+
+                # Look for another literal to watch instead
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if self.value(clause[0]) is False:
+                        kept.extend(watchers[position + 1:])
+                        self.watches[false_literal] = kept
+                        return index
+                    self.enqueue(clause[0], index)
+            self.watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the clause learned from a conflict, with the literal to
+        assert first, and the decision level to return to.
+        """
+        learned = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        position = len(self.trail) - 1
+        index = conflict
+        current = len(self.trail_limits)
+
+        while True:
+            for other in self.clauses[index]:
+                variable = abs(other)
+                if other == literal or variable in seen:
+                    continue
+                if self.level[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.level[variable] == current:
+                    pending += 1
+                else:
+                    learned.append(other)
+
+            # Walk back along the trail to the next literal to explain
+            while abs(self.trail[position]) not in seen:
+                position -= 1
+            literal = self.trail[position]
+            position -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            index = self.reason[abs(literal)]
+
+        learned[0] = -literal
+        if len(learned) == 1:
+            return learned, 0
+        deepest = max(range(1, len(learned)),
+                      key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[deepest] = learned[deepest], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+
+    def backtrack(self, level):
+        """Undoes every assignment made after decision level `level`."""
+        if len(self.trail_limits) <= level:
+            return
+        for literal in self.trail[self.trail_limits[level]:]:
+            variable = abs(literal)
+            self.phase[variable] = self.assignment[variable]
+            self.assignment[variable] = None
+            self.reason[variable] = None
+        del self.trail[self.trail_limits[level]:]
+        del self.trail_limits[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """Returns the unassigned variable with the highest activity."""
+        best = None
+        for variable in range(1, self.count + 1):
+            if self.assignment[variable] is None and (
+                best is None or self.activity[variable] > self.activity[best]
+            ):
+                best = variable
+        return best
+
+    def solve(self, assumptions=()):
+        """
+        Returns a satisfying assignment as a list indexed by variable,
+        with every literal in `assumptions` true, or None if there is
+        none.
+        """
+        if not self.consistent:
+            return None
+        self.backtrack(0)
+        self.grow(max((abs(literal) for literal in assumptions), default=0))
+        if self.propagate() is not None:
+            self.consistent = False
+            return None
+
+        conflicts = 0
+        restart = 100
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if len(self.trail_limits) == 0:
+                    self.consistent = False
+                    return None
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.enqueue(learned[0], None)
+                else:
+                    self.enqueue(learned[0], self.attach(learned))
+                self.increment /= 0.95
+                conflicts += 1
+                continue
+
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.backtrack(0)
+                continue
+
+            # Assumptions are the first decisions, one level each
+            level = len(self.trail_limits)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                if self.value(literal) is False:
+                    return None
+                self.trail_limits.append(len(self.trail))
+                if self.value(literal) is None:
+                    self.enqueue(literal, None)
+                continue
+
+            variable = self.decide()
+            if variable is None:
+                return list(self.assignment)
+            self.trail_limits.append(len(self.trail))
+            literal = variable if self.phase[variable] else -variable
+            self.enqueue(literal, None)
+
+
+def dpll_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, by showing with a SAT solver
+    that the knowledge base and the negated query cannot both be true.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.add(Not(query))
+    solver = Solver(len(cnf.names) - 1, cnf.clauses)
+    return solver.solve() is None
+
+
+class KnowledgeBase():
+    """
+    Knowledge base that grows one sentence at a time and answers many
+    entailment queries with a single incremental SAT solver.
+
+    Each query is checked by assuming it is false, so clauses learned
+    while answering one query are kept for every later query. Every
+    model found along the way is remembered, and a query that is false
+    in one of them is answered without calling the solver again.
+    """
+
+    def __init__(self, *sentences):
+        self.sentences = []
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.loaded = 0
+        self.models = []
+        self.answers = dict()
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds `sentence` to the knowledge base."""
+        Sentence.validate(sentence)
+        self.sentences.append(sentence)
+        self.cnf.add(sentence)
+        self.load()
+
+        # Entailed queries stay entailed, but models may no longer hold
+        self.models = []
+        self.answers = {
+            query: True for query, entailed in self.answers.items() if entailed
+        }
+
+    def load(self):
+        """Passes clauses not yet seen by the solver on to it."""
+        for clause in self.cnf.clauses[self.loaded:]:
+            self.solver.add_clause(clause)
+        self.loaded = len(self.cnf.clauses)
+
+    def entails(self, query):
+        """Checks if the knowledge base entails `query`."""
+        Sentence.validate(query)
+        if query in self.answers:
+            return self.answers[query]
+
+        symbols = query.symbols()
+        for model in self.models:
+            if symbols <= model.keys() and not query.evaluate(model):
+                self.answers[query] = False
+                return False
+
+        # Defining the query's parts only adds equivalences, which hold
+        # whatever is added to the knowledge base later
+        literal = self.cnf.literal(query)
+        self.load()
+        assignment = self.solver.solve([-literal])
+        if assignment is not None:
+            self.models.append({
+                name: bool(assignment[variable])
+                for name, variable in self.cnf.variables.items()
+            })
+        self.answers[query] = assignment is None
+        return self.answers[query]
+
+
+def resolution_check(knowledge, query, max_clauses=None):
+    """
+    Checks if knowledge base entails query by resolution refutation.
+
+    The clauses of the negated query form the set of support: every
+    resolution step uses at least one clause derived from them, shortest
+    clauses first, and resolvents subsumed by a clause already kept are
+    dropped. Partners for each resolution are found through an index
+    from literals to the clauses containing them. The knowledge base is
+    assumed to be consistent, as set-of-support resolution only looks for
+    contradictions involving the query.
+
+    Returns None if `max_clauses` clauses are kept without deciding.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    negated = -cnf.literal(query)
+
+    clauses = []
+    index = dict()
+
+    def subsumed(clause):
+        # A subsuming clause shares at least one literal with `clause`
+        for literal in clause:
+            for other in index.get(literal, ()):
+                if clauses[other] <= clause:
+                    return True
+        return False
+
+    def keep(clause):
+        clauses.append(clause)
+        for literal in clause:
+            index.setdefault(literal, set()).add(len(clauses) - 1)
+
+    # The knowledge base and the definitions of the query's parts
+    for clause in cnf.clauses:
+        clause = frozenset(clause)
+        if not any(-literal in clause for literal in clause):
+            if not subsumed(clause):
+                keep(clause)
+
+    support = [(1, 0, frozenset([negated]))]
+    counter = itertools.count(1)
+    while support:
+        _, _, given = heapq.heappop(support)
+        if subsumed(given):
+            continue
+        keep(given)
+        if max_clauses is not None and len(clauses) > max_clauses:
+            return None
+
+        for literal in given:
+            for other in list(index.get(-literal, ())):
+                resolvent = (given - {literal}) | (clauses[other] - {-literal})
+                if not resolvent:
+                    return True
+                if any(-part in resolvent for part in resolvent):
+                    continue
+                if not subsumed(resolvent):
+                    heapq.heappush(
+                        support, (len(resolvent), next(counter), resolvent)
+                    )
+    return False
+
+
+class ModelCounter():
+    """
+    Counts the models of clauses in the style of a #SAT solver.
+
+    Clauses are frozensets of literals. Unit clauses are propagated, the
+    remaining clauses are split into components that share no variables
+    and are counted independently, and the count of every component is
+    cached, so repeated subproblems are counted once.
+    """
+
+    def __init__(self):
+        self.cache = dict()
+
+    def condition(self, clauses, literal):
+        """Returns the clauses that remain once `literal` is true."""
+        return frozenset(
+            clause - {-literal} for clause in clauses if literal not in clause
+        )
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    def propagate(self, clauses):
+        """
+        Assigns the literals of unit clauses until none are left, and
+        returns the remaining clauses, or None if they cannot be
+        satisfied, together with the set of literals made true.
+        """
+        assigned = set()
+        while True:
+            if frozenset() in clauses:
+                return None, assigned
+            units = {literal for clause in clauses if len(clause) == 1
+                     for literal in clause}
+            if not units:
+                return clauses, assigned
+            falsified = {-literal for literal in units}
+            if units & falsified:
+                return None, assigned
+            clauses = frozenset(
+                clause - falsified for clause in clauses
+                if not clause & units
+            )
+            assigned |= units
+
+    def components(self, clauses):
+        """Splits clauses into groups that share no variables."""
+        occurrences = dict()
+        for clause in clauses:
+            for literal in clause:
+                occurrences.setdefault(abs(literal), []).append(clause)
+
+        seen = set()
+        for clause in clauses:
+            if clause in seen:
+                continue
+            seen.add(clause)
+            component = []
+            frontier = [clause]
+            while frontier:
+                current = frontier.pop()
+                component.append(current)
+                for literal in current:
+                    for other in occurrences.pop(abs(literal), ()):
+                        if other not in seen:
+                            seen.add(other)
+                            frontier.append(other)
+            yield frozenset(component)
+
+    def count(self, clauses, variables):
+        """
+        Returns the number of assignments to `variables` that satisfy
+        `clauses`, which may only mention those variables.
+        """
+        clauses, assigned = self.propagate(clauses)
+        if clauses is None:
+            return 0
+        mentioned = {abs(literal) for clause in clauses for literal in clause}
+        assigned = {abs(literal) for literal in assigned}
+
+        # Variables no clause mentions any more can take either value
+        total = 1 << len(variables - assigned - mentioned)
+        for component in self.components(clauses):
+            total *= self.count_component(component)
+            if total == 0:
+                return 0
+        return total
+
+    def count_component(self, clauses):
+        """
+        Returns the number of assignments to the variables of `clauses`
+        that satisfy them, branching on the most frequent variable.
+        """
+        if clauses in self.cache:
+            return self.cache[clauses]
+        frequency = collections.Counter(
+            abs(literal) for clause in clauses for literal in clause
+        )
+        variable = max(frequency, key=frequency.get)
+        variables = frequency.keys() - {variable}
+        result = (
+            self.count(self.condition(clauses, variable), variables)
+            + self.count(self.condition(clauses, -variable), variables)
+        )
+        self.cache[clauses] = result
+        return result
+
+
+def model_clauses(knowledge, symbols=None):
+    """
+    Returns the CNF of `knowledge`, with a variable for every name in
+    `symbols`, and its clauses as frozensets without tautologies.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    for name in sorted(symbols or ()):
+        cnf.variable(name)
+    clauses = frozenset(
+        frozenset(clause) for clause in cnf.clauses
+        if not any(-literal in clause for literal in clause)
+    )
+    return cnf, clauses
+
+
+def count_models(knowledge, symbols=None):
+    """
+    Returns the number of models of the symbols in `knowledge`, and of
+    the names in `symbols` if given, in which `knowledge` is true.
+
+    Every variable the encoding introduces is equivalent to part of the
+    knowledge base, so each model has exactly one extension to them and
+    counting the models of the clauses counts the models of the symbols.
+    """
+    cnf, clauses = model_clauses(knowledge, symbols)
+    variables = set(range(1, len(cnf.names)))
+    return ModelCounter().count(clauses, variables)
+
+
+def iter_models(knowledge, symbols=None):
+    """
+    Yields every model in which `knowledge` is true, as a dictionary
+    from each symbol name to its value, in order of the sorted names
+    with False before True.
+
+    Symbols are assigned one at a time, and a partial model is only
+    extended if the model counter finds it can still be completed, so
+    no time is spent on assignments that lead to no model.
+    """
+    cnf, clauses = model_clauses(knowledge, symbols)
+    names = sorted(set.union(knowledge.symbols(), set(symbols or ())))
+    counter = ModelCounter()
+    variables = set(range(1, len(cnf.names)))
+    if not counter.count(clauses, variables):
+        return
+
+    # Each partial model keeps its clauses simplified by unit propagation,
+    # along with the literals that propagation made true
+    stack = [(clauses, variables, frozenset(), dict())]
+    while stack:
+        clauses, variables, forced, model = stack.pop()
+        if len(model) == len(names):
+            yield model
+            continue
+        name = names[len(model)]
+        variable = cnf.variables[name]
+
+        # Push True first so that False is extended first
+        for value in (True, False):
+            literal = variable if value else -variable
+            if -literal in forced:
+                continue
+            conditioned, assigned = counter.propagate(
+                counter.condition(clauses, literal)
+            )
+            if conditioned is None:
+                continue
+            remaining = variables - {variable} - {
+                abs(other) for other in assigned
+            }
+            if counter.count(conditioned, remaining):
+                stack.append((conditioned, remaining, forced | assigned,
+                              {**model, name: value}))
@@ -0,0 +1,169 @@
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pagerank import (DAMPING, crawl, iterate_pagerank,
+                      iterate_pagerank_sparse, sample_pagerank)
+
+SIZES = [10, 100, 500]
+SAMPLES = 10000
+SEED = 0
+
+
+def main():
+    if len(sys.argv) > 1:
+        try:
+            sizes = [int(size) for size in sys.argv[1:]]
+        except ValueError:
+            sys.exit("Usage: python benchmark.py [size ...]")
+    else:
+        sizes = SIZES
+
+    # Print one JSON object per line so results can be compared across runs
+    for result in run(sizes):
+        print(json.dumps(result), flush=True)
+
+
+def run(sizes, seed=SEED):
+    """
+    Benchmark `crawl`, `sample_pagerank`, `iterate_pagerank` and
+    `iterate_pagerank_sparse` on every synthetic graph in `GRAPHS` at each
+    size in `sizes`, and yield one result dictionary per measurement.
+    """
+    for size in sizes:
+        for name, generate in GRAPHS.items():
+            corpus = generate(size, random.Random(seed))
+            with tempfile.TemporaryDirectory() as directory:
+                write_corpus(corpus, directory)
+                measurements = [
+                    ("crawl", lambda: crawl(directory)),
+                    ("sample_pagerank",
+                     lambda: sample_pagerank(corpus, DAMPING, SAMPLES)),
+                    ("iterate_pagerank",
+                     lambda: iterate_pagerank(corpus, DAMPING)),
+                    ("iterate_pagerank_sparse",
+                     lambda: iterate_pagerank_sparse(corpus, DAMPING))
+                ]
+                for function, call in measurements:
+                    seconds, peak = measure(call)
+                    yield {
+                        "graph": name,
+                        "pages": size,
+                        "links": sum(len(links) for links in corpus.values()),
+                        "function": function,
+                        "seconds": seconds,
+                        "peak_kb": peak / 1024,
+                        "python": platform.python_version()
+                    }
+
+
+def measure(call):
+    """
+    Return the elapsed wall time in seconds of one call to `call`, and
+    the peak memory allocated during a second call in bytes.
+
+    Tracing allocations slows some functions far more than others, so
+    the timed call runs without it.
+    """
+    start = time.perf_counter()
+    call()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def write_corpus(corpus, directory):
+    """
+    Write a corpus dictionary as HTML pages in `directory`, one file per
+    page linking to every page in its set of links.
+    """
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write("<!DOCTYPE html>\n<html>\n<body>\n")
+            for link in sorted(links):
+                f.write(f'<a href="{link}">{link}</a>\n')
+            f.write("</body>\n</html>\n")
+
+
+def page_names(n):
+    return [f"{i}.html" for i in range(n)]
+
+
+def power_law_graph(n, rng, links=5):
+    """
+    Return a corpus of `n` pages where each page links to about `links`
+    others, chosen by preferential attachment so that in-degrees follow
+    a power law.
+    """
+    pages = page_names(n)
+    corpus = {page: set() for page in pages}
+    targets = []
+    for i, page in enumerate(pages):
+        for _ in range(min(links, i)):
+            # half the time pick a page in proportion to its in-degree
+            if targets and rng.random() < 0.5:
+                link = rng.choice(targets)
+            else:
+                link = pages[rng.randrange(i)]
+            corpus[page].add(link)
+            targets.append(link)
+    return corpus
+
+
+def chain_graph(n, rng):
+    """
+    Return a corpus of `n` pages where each page links only to the next.
+    """
+    pages = page_names(n)
+    return {
+        page: {pages[i + 1]} if i + 1 < n else set()
+        for i, page in enumerate(pages)
+    }
+
+
+def star_graph(n, rng):
+    """
+    Return a corpus of `n` pages where the first page links to every
+    other page, and every other page links back to it.
+    """
+    pages = page_names(n)
+    corpus = {page: {pages[0]} for page in pages[1:]}
+    corpus[pages[0]] = set(pages[1:])
+    return corpus
+
+
+def dangling_heavy_graph(n, rng, fraction=0.5, links=3):
+    """
+    Return a corpus of `n` pages where `fraction` of pages have no links
+    and the rest link to `links` pages chosen at random.
+    """
+    pages = page_names(n)
+    return {
+        page: set() if rng.random() < fraction else {
+            link for link in rng.sample(pages, min(links, n)) if link != page
+        }
+        for page in pages
+    }
+
+
+GRAPHS = {
+    "power_law": power_law_graph,
+    "chain": chain_graph,
+    "star": star_graph,
+    "dangling_heavy": dangling_heavy_graph
+}
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,73 @@
+import collections
+import multiprocessing
+import multiprocessing.shared_memory
 import os
 import random
 import re
+import shutil
 import sys
+import tempfile
+import time
 import copy
 import numpy as np
 
+try:
+    import resource
+except ImportError:
+    # peak memory is not reported on platforms without `resource`
+    resource = None
+
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 1e-8
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    arguments = sys.argv[1:]
+    options = dict(zip(arguments[1::2], arguments[2::2]))
+    if (len(arguments) % 2 != 1
+            or len(options) != len(arguments) // 2
+            or not set(options) <= {"--method", "--shards"}):
+        sys.exit("Usage: python pagerank.py corpus "
+                 "[--method method] [--shards shards]")
+    method = options.get("--method")
+    if method is not None and method not in METHODS:
+        sys.exit(f"Method must be one of: {', '.join(METHODS)}")
+    shards = options.get("--shards")
+    if shards is not None:
+        if method is not None:
+            sys.exit("--shards uses power iteration and cannot be combined "
+                     "with --method")
+        if not shards.isdigit() or int(shards) < 1:
+            sys.exit("Shards must be a positive integer")
+        shards = int(shards)
+
+    corpus = cached_crawl(arguments[0])
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
+    if method is not None:
+        ranks, history = solve_pagerank(corpus, DAMPING, method, TOLERANCE)
+        print(f"PageRank Results from Iteration (method = {method})")
+    elif shards is not None:
+        ranks = sharded_pagerank(corpus, DAMPING, shards)
+        print(f"PageRank Results from Iteration (shards = {shards})")
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
+        print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    if method is not None:
+        if history[-1]["residual"] < TOLERANCE:
+            print(f"Converged in {len(history)} iterations "
+                  f"({history[-1]['seconds']:.4f} s)")
+        else:
+            print(f"Did not converge in {len(history)} iterations "
+                  f"({history[-1]['seconds']:.4f} s)")
+        for record in history:
+            print(f"  {record['iteration']}: residual "
+                  f"{record['residual']:.2e} at {record['seconds']:.4f} s")
 
 
 def crawl(directory):
@@ -50,6 +97,265 @@ def crawl(directory):
     return pages
 
 
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+# text that could still grow into a `LINK_PATTERN` match
+LINK_PREFIX = re.compile(r"<(?:a(?:\s+[^>]*?(?:href=\"[^\"]*)?)?)?")
+CHUNK_SIZE = 1 << 20
+
+# page name to index mapping shared with crawl worker processes
+_crawl_index = None
+
+
+def crawl_edges(directory, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse a directory of HTML pages across a pool of `processes` worker
+    processes, streaming each file in chunks of `chunk_size` characters.
+
+    Return a tuple `(pages, edges, stats)` where `pages` is a sorted list
+    of page names, `edges` is an integer array of shape (E, 2) holding
+    `(source, target)` page indices for every distinct link between two
+    pages in the corpus, and `stats` reports pages crawled, elapsed
+    seconds, pages per second and peak resident set size in kilobytes
+    (`None` where the platform cannot report it).
+    """
+    start = time.perf_counter()
+    pages = sorted(filename for filename in os.listdir(directory)
+                   if filename.endswith(".html"))
+    index = {page: i for i, page in enumerate(pages)}
+    tasks = [(directory, page, chunk_size) for page in pages]
+
+    if processes == 1:
+        _init_crawl_worker(index)
+        targets = list(map(_crawl_page, tasks))
+    else:
+        with multiprocessing.Pool(processes, _init_crawl_worker,
+                                  (index,)) as pool:
+            targets = pool.map(_crawl_page, tasks,
+                               chunksize=max(1, len(tasks) // 64))
+
+    edges = np.zeros((sum(len(t) for t in targets), 2), dtype=np.int64)
+    position = 0
+    for source, links in enumerate(targets):
+        edges[position:position + len(links), 0] = source
+        edges[position:position + len(links), 1] = links
+        position += len(links)
+
+    elapsed = time.perf_counter() - start
+    peak_rss = None if resource is None else max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    stats = {
+        "pages": len(pages),
+        "seconds": elapsed,
+        "pages_per_second": len(pages) / elapsed if elapsed else 0.0,
+        "peak_rss_kb": peak_rss
+    }
+    return pages, edges, stats
+
+
+def crawl_parallel(directory, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse a directory of HTML pages like `crawl`, using `crawl_edges`.
+    Return the same dictionary `crawl` would.
+    """
+    pages, edges, _ = crawl_edges(directory, processes, chunk_size)
+    corpus = {page: set() for page in pages}
+    for source, target in edges.tolist():
+        corpus[pages[source]].add(pages[target])
+    return corpus
+
+
+def _init_crawl_worker(index):
+    global _crawl_index
+    _crawl_index = index
+
+
+def _crawl_page(task):
+    """
+    Return the sorted indices of pages in the corpus linked to by one
+    page, reading the file in chunks.
+    """
+    directory, filename, chunk_size = task
+    return sorted(_crawl_index[link]
+                  for link in _read_links(directory, filename, chunk_size)
+                  if link in _crawl_index)
+
+
+def _read_links(directory, filename, chunk_size=CHUNK_SIZE):
+    """
+    Return the set of links on one page, other than links to itself,
+    reading the file in chunks.
+    """
+    links = set()
+    tail = ""
+    with open(os.path.join(directory, filename)) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer = tail + chunk
+            if not chunk:
+                links.update(LINK_PATTERN.findall(buffer))
+                break
+
+            end = 0
+            for match in LINK_PATTERN.finditer(buffer):
+                links.add(match.group(1))
+                end = match.end()
+
+            # carry over the text from the first "<" after the last link
+            # that more text could still turn into a link
+            tail = ""
+            start = buffer.find("<", end)
+            while start != -1:
+                if LINK_PREFIX.fullmatch(buffer, start):
+                    tail = buffer[start:]
+                    break
+                start = buffer.find("<", start + 1)
+
+    links.discard(filename)
+    return links
+
+
+GRAPH_CACHE = ".linkgraph"
+GRAPH_ARRAYS = ("pages", "sizes", "mtimes", "names", "indptr", "indices")
+
+
+def load_graph(directory, chunk_size=CHUNK_SIZE):
+    """
+    Return the compiled link graph of a directory of HTML pages, in the
+    same form as `compile_corpus`, using an on-disk cache.
+
+    The cache is kept in a `GRAPH_CACHE` directory inside `directory` and
+    stores, for every page, its name, size, modification time and raw
+    links. Only pages whose name, size or modification time changed since
+    the cache was written are parsed again; if nothing changed, the cached
+    arrays are memory-mapped and no page is read at all.
+    """
+    pages, sizes, mtimes = [], [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                stat = entry.stat()
+                pages.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    pages.sort()
+    sizes = np.array([page[1] for page in pages], dtype=np.int64)
+    mtimes = np.array([page[2] for page in pages], dtype=np.int64)
+    pages = [page[0] for page in pages]
+
+    cache = _read_graph_cache(directory)
+    if (cache is None
+            or len(cache["pages"]) != len(pages)
+            or not np.array_equal(cache["pages"], np.array(pages, dtype=str))
+            or not np.array_equal(cache["sizes"], sizes)
+            or not np.array_equal(cache["mtimes"], mtimes)):
+        cache = _write_graph_cache(directory, pages, sizes, mtimes, cache,
+                                   chunk_size)
+
+    # links with a name index past the pages point outside the corpus
+    N = len(pages)
+    indptr, indices = cache["indptr"], cache["indices"]
+    sources = np.repeat(np.arange(N), np.diff(indptr))
+    keep = indices < N
+    out_degree = np.bincount(sources[keep], minlength=N)
+    new_indptr = np.zeros(N + 1, dtype=np.int64)
+    np.cumsum(out_degree, out=new_indptr[1:])
+    return pages, new_indptr, np.asarray(indices[keep]), out_degree
+
+
+def cached_crawl(directory):
+    """
+    Parse a directory of HTML pages like `crawl`, using `load_graph`.
+    Return the same dictionary `crawl` would.
+    """
+    pages, indptr, indices, _ = load_graph(directory)
+    return {
+        page: {pages[link] for link in indices[indptr[i]:indptr[i + 1]]}
+        for i, page in enumerate(pages)
+    }
+
+
+def _read_graph_cache(directory):
+    """
+    Return the cached arrays for `directory`, memory-mapped,
+    or `None` if there is no usable cache.
+    """
+    path = os.path.join(directory, GRAPH_CACHE)
+    try:
+        return {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in GRAPH_ARRAYS
+        }
+    except (OSError, ValueError):
+        return None
+
+
+def _write_graph_cache(directory, pages, sizes, mtimes, cache, chunk_size):
+    """
+    Rebuild the cache for `directory`, reusing the links of pages that
+    are unchanged in `cache`, and return the new arrays.
+    """
+    previous = {}
+    if cache is not None:
+        previous = {page: i for i, page in enumerate(cache["pages"].tolist())}
+
+    links = []
+    for page, size, mtime in zip(pages, sizes, mtimes):
+        i = previous.get(page)
+        if (i is not None and cache["sizes"][i] == size
+                and cache["mtimes"][i] == mtime):
+            start, end = cache["indptr"][i], cache["indptr"][i + 1]
+            links.append(set(cache["names"][cache["indices"][start:end]]
+                             .tolist()))
+        else:
+            links.append(_read_links(directory, page, chunk_size))
+
+    # name every page first, then every link outside the corpus
+    page_set = set(pages)
+    names = pages + sorted(
+        set().union(*links) - page_set if links else set()
+    )
+    index = {name: i for i, name in enumerate(names)}
+    indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum([len(page_links) for page_links in links], out=indptr[1:])
+    indices = np.array(
+        [index[link] for page_links in links for link in sorted(
+            page_links, key=index.get
+        )],
+        dtype=np.int64
+    )
+
+    arrays = {
+        "pages": np.array(pages, dtype=str),
+        "sizes": sizes,
+        "mtimes": mtimes,
+        "names": np.array(names, dtype=str),
+        "indptr": indptr,
+        "indices": indices
+    }
+    # write every array into a fresh directory and swap it in whole, so
+    # that an interrupted run leaves either the old cache or the new one
+    path = os.path.join(directory, GRAPH_CACHE)
+    temporary = None
+    try:
+        temporary = tempfile.mkdtemp(prefix=f"{GRAPH_CACHE}.", dir=directory)
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), array)
+        if os.path.isdir(path):
+            stale = tempfile.mkdtemp(prefix=f"{GRAPH_CACHE}.", dir=directory)
+            os.replace(path, stale)
+            os.replace(temporary, path)
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            os.replace(temporary, path)
+    except OSError:
+        # a corpus that cannot be written to is still ranked, uncached
+        pass
+    finally:
+        if temporary is not None and os.path.isdir(temporary):
+            shutil.rmtree(temporary, ignore_errors=True)
+    return arrays
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -85,6 +391,79 @@ def transition_model(corpus, page, damping_factor):
     return answer
 
 
+class TransitionModel():
+    """
+    Transition model compiled once from a corpus.
+
+    Each page's distribution is cached in compact form, as a tuple of
+    linked page indices plus the teleport probability shared by every
+    page, so lookups cost O(out-degree) rather than O(N). At most
+    `maxsize` distributions are kept, least recently used first out;
+    `None` keeps all of them.
+    """
+
+    def __init__(self, corpus, damping_factor, maxsize=None):
+        self.corpus = corpus
+        self.damping_factor = damping_factor
+        self.maxsize = maxsize
+        self.pages = sorted(corpus)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        self.teleport = (1 - damping_factor) / len(self.pages)
+        self.cache = collections.OrderedDict()
+
+    def links(self, page):
+        """
+        Return the tuple of page indices linked to by `page`,
+        ignoring duplicates, self links and pages outside the corpus.
+        """
+        try:
+            self.cache.move_to_end(page)
+            return self.cache[page]
+        except KeyError:
+            pass
+        links = tuple(sorted(
+            self.index[link] for link in set(self.corpus[page])
+            if link != page and link in self.index
+        ))
+        self.cache[page] = links
+        if self.maxsize is not None and len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return links
+
+    def probability(self, page, target):
+        """
+        Return the probability of visiting `target` next from `page`.
+        """
+        links = self.links(page)
+        if not links:
+            return 1 / len(self.pages)
+        linked = self.index[target] in links
+        return self.teleport + (self.damping_factor / len(links)
+                                if linked else 0)
+
+    def distribution(self, page):
+        """
+        Return the full distribution for `page` in the same form as
+        `transition_model`.
+        """
+        links = self.links(page)
+        if not links:
+            return {each_page: 1 / len(self.pages) for each_page in self.pages}
+        answer = {each_page: self.teleport for each_page in self.pages}
+        for i in links:
+            answer[self.pages[i]] += self.damping_factor / len(links)
+        return answer
+
+    def sample(self, page):
+        """
+        Return the next page visited from `page`, chosen at random.
+        """
+        links = self.links(page)
+        if links and random.random() < self.damping_factor:
+            return self.pages[random.choice(links)]
+        return random.choice(self.pages)
+
+
 def sample_pagerank(corpus, damping_factor, n):
     """
     Return PageRank values for each page by sampling `n` pages
@@ -99,30 +478,495 @@ def sample_pagerank(corpus, damping_factor, n):
     for each_page in corpus:
         holder[each_page] = 0
         
+    model = TransitionModel(corpus, damping_factor)
+
     #  for first iteration
     init_page = random.choice(list(corpus.keys())) 
     
     for i in range(n):
-        probabilities = transition_model(corpus,init_page,damping_factor)
-        next_page = calculate_page(probabilities)
+        next_page = model.sample(init_page)
 
         holder[next_page] +=1/n
 
         init_page = next_page
     return holder
-        
-def calculate_page(trans_prob):
-    
-    random_prob = random.uniform(0,1)
-    lower_limit = 0
-    upper_limit = 0
-    for link,prob in trans_prob.items():
-        upper_limit += prob
-        if random_prob >= lower_limit and random_prob < upper_limit:
-            return link
+
+
+def personalized_pagerank(corpus, damping_factor, teleports, tolerance=1e-8,
+                          max_iterations=1000):
+    """
+    Return personalized PageRank values for many teleport distributions
+    at once, solved together as one N by K iteration that shares the
+    sparse adjacency compiled from `corpus`.
+
+    `teleports` maps a name (e.g. a topic or a user) to a dictionary of
+    page weights; with probability `1 - damping_factor` the surfer jumps
+    to a page chosen in proportion to those weights, and pages left out
+    have weight 0. Pages with no links are interpreted as jumping the
+    same way. Iteration stops once every column's L1 change is below
+    `tolerance`, or after `max_iterations` rounds.
+
+    Return a dictionary mapping each name in `teleports` to a dictionary
+    of PageRank values for each page, summing to 1. Raise ValueError if
+    a teleport has a negative weight or weights summing to 0.
+    """
+    pages, indptr, indices, out_degree = compile_corpus(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    names = list(teleports)
+
+    teleport = np.zeros((len(pages), len(names)))
+    for k, name in enumerate(names):
+        for page, weight in teleports[name].items():
+            if weight < 0:
+                raise ValueError(
+                    f"teleport {name!r} has negative weight for {page!r}")
+            teleport[index[page], k] = weight
+        if teleport[:, k].sum() == 0:
+            raise ValueError(f"teleport {name!r} has total weight 0")
+    teleport /= teleport.sum(axis=0)
+
+    ranks = power_iterate_batch(indptr, indices, out_degree, damping_factor,
+                                teleport, tolerance, max_iterations)
+    return {
+        name: dict(zip(pages, ranks[:, k].tolist()))
+        for k, name in enumerate(names)
+    }
+
+
+def power_iterate_batch(indptr, indices, out_degree, damping_factor,
+                        teleport, tolerance=1e-8, max_iterations=1000):
+    """
+    Run PageRank power iteration on a compiled adjacency for every column
+    of the N by K `teleport` matrix, and return the N by K rank matrix.
+    """
+    dangling = out_degree == 0
+    safe_degree = np.where(dangling, 1, out_degree)[:, np.newaxis]
+
+    # group edges by target once so every round sums all K columns with
+    # a single reduction
+    order = np.argsort(indices, kind="stable")
+    sources = np.repeat(np.arange(len(out_degree)), out_degree)[order]
+    targets, starts = np.unique(indices[order], return_index=True)
+    ranks = teleport.copy()
+
+    for _ in range(max_iterations):
+        new_ranks = np.zeros_like(ranks)
+        if len(indices):
+            shares = (ranks / safe_degree)[sources]
+            new_ranks[targets] = np.add.reduceat(shares, starts, axis=0)
+        dangling_mass = ranks[dangling].sum(axis=0)
+        new_ranks = (damping_factor * (new_ranks + dangling_mass * teleport)
+                     + (1 - damping_factor) * teleport)
+        new_ranks /= new_ranks.sum(axis=0)
+        residual = np.abs(new_ranks - ranks).sum(axis=0).max()
+        ranks = new_ranks
+        if residual < tolerance:
+            break
+    return ranks
+
+
+# shared arrays attached by each sharded PageRank worker process
+_shard_arrays = None
+
+
+def sharded_pagerank(corpus, damping_factor, shards=None, tolerance=1e-8,
+                     max_iterations=1000):
+    """
+    Return PageRank values for each page using power iteration split
+    across `shards` worker processes (one per CPU by default).
+
+    Pages are partitioned into contiguous shards holding about the same
+    number of incoming links. Every iteration, each worker sums the
+    contributions flowing into its shard from the rank vector in shared
+    memory, so contributions crossing shard boundaries are exchanged
+    through that vector. Results match `iterate_pagerank_sparse`.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value. All PageRank values sum to 1.
+    """
+    pages, indptr, indices, out_degree = compile_corpus(corpus)
+    N = len(pages)
+    shards = max(1, min(shards or os.cpu_count() or 1, N))
+    dangling = out_degree == 0
+
+    # lay edges out by target so each shard owns one contiguous range
+    order = np.argsort(indices, kind="stable")
+    arrays = {
+        "ranks": np.full(N, 1 / N),
+        "new_ranks": np.zeros(N),
+        "inverse_degree": 1 / np.where(dangling, 1, out_degree),
+        "sources": np.repeat(np.arange(N), out_degree)[order],
+        "targets": indices[order],
+        "in_pointer": np.concatenate(
+            ([0], np.cumsum(np.bincount(indices, minlength=N)))
+        )
+    }
+    boundaries = np.searchsorted(
+        arrays["in_pointer"], np.linspace(0, len(indices), shards + 1)
+    )
+    boundaries[0], boundaries[-1] = 0, N
+    ranges = [(int(low), int(high))
+              for low, high in zip(boundaries, boundaries[1:]) if high > low]
+
+    blocks = {}
+    try:
+        for name, array in arrays.items():
+            block = multiprocessing.shared_memory.SharedMemory(
+                create=True, size=max(array.nbytes, 1)
+            )
+            blocks[name] = block
+            np.ndarray(array.shape, array.dtype, block.buf)[:] = array
+        layout = {name: (block.name, arrays[name].shape, arrays[name].dtype)
+                  for name, block in blocks.items()}
+        ranks = np.ndarray(arrays["ranks"].shape, arrays["ranks"].dtype,
+                           blocks["ranks"].buf)
+        new_ranks = np.ndarray(arrays["new_ranks"].shape,
+                               arrays["new_ranks"].dtype,
+                               blocks["new_ranks"].buf)
+
+        with multiprocessing.Pool(len(ranges), _init_shard_worker,
+                                  (layout, damping_factor)) as pool:
+            for _ in range(max_iterations):
+                pool.map(_shard_step, ranges)
+                update = (new_ranks + damping_factor
+                          * ranks[dangling].sum() / N
+                          + (1 - damping_factor) / N)
+                update /= update.sum()
+                residual = np.abs(update - ranks).sum()
+                ranks[:] = update
+                if residual < tolerance:
+                    break
+        answer = dict(zip(pages, ranks.tolist()))
+        del ranks, new_ranks
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+    return answer
+
+
+def _init_shard_worker(layout, damping_factor):
+    global _shard_arrays
+    _shard_arrays = {"damping_factor": damping_factor, "blocks": []}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = multiprocessing.shared_memory.SharedMemory(block_name)
+        _shard_arrays["blocks"].append(block)
+        _shard_arrays[name] = np.ndarray(shape, dtype, block.buf)
+
+
+def _shard_step(shard):
+    """
+    Write the damped link contributions into the pages `low` to `high`
+    of the shared new rank vector.
+    """
+    low, high = shard
+    arrays = _shard_arrays
+    start, end = arrays["in_pointer"][low], arrays["in_pointer"][high]
+    sources = arrays["sources"][start:end]
+    shares = arrays["ranks"][sources] * arrays["inverse_degree"][sources]
+    arrays["new_ranks"][low:high] = arrays["damping_factor"] * np.bincount(
+        arrays["targets"][start:end] - low, weights=shares,
+        minlength=high - low
+    )
+
+
+METHODS = ("power", "gauss-seidel", "aitken")
+AITKEN_PERIOD = 10
+
+
+def solve_pagerank(corpus, damping_factor, method="power", tolerance=1e-8,
+                   max_iterations=1000):
+    """
+    Return PageRank values for each page together with a record of how
+    the iteration converged.
+
+    `method` is one of `METHODS`: plain power iteration, Gauss-Seidel
+    sweeps that use each page's updated rank as soon as it is computed,
+    or power iteration with Aitken extrapolation every `AITKEN_PERIOD`
+    iterations, taken only when it lowers the residual. Gauss-Seidel
+    suits long chains of links, while Aitken extrapolation helps where a
+    few slowly decaying components dominate the error. Iteration stops
+    once the L1 change between iterations is below `tolerance`, or after
+    `max_iterations` rounds.
+
+    Return a tuple `(ranks, history)` where `ranks` is a dictionary of
+    PageRank values summing to 1, and `history` is a list with one
+    dictionary per iteration holding its `iteration` number, L1
+    `residual` and cumulative wall time in `seconds`.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}")
+    pages, indptr, indices, out_degree = compile_corpus(corpus)
+    N = len(pages)
+    dangling = out_degree == 0
+    safe_degree = np.where(dangling, 1, out_degree)
+
+    if method == "gauss-seidel":
+        # each page needs the pages linking to it, in order of the sweep
+        order = np.argsort(indices, kind="stable")
+        in_links = np.split(
+            np.repeat(np.arange(N), out_degree)[order],
+            np.cumsum(np.bincount(indices, minlength=N))[:-1]
+        )
+        in_links = [links.tolist() for links in in_links]
+        inverse_degree = (1 / safe_degree).tolist()
+        dangling_pages = np.flatnonzero(dangling).tolist()
+
+    def power_step(ranks):
+        shares = np.repeat(ranks / safe_degree, out_degree)
+        new_ranks = np.bincount(indices, weights=shares, minlength=N)
+        new_ranks = (damping_factor * (new_ranks + ranks[dangling].sum() / N)
+                     + (1 - damping_factor) / N)
+        return new_ranks / new_ranks.sum()
+
+    start = time.perf_counter()
+    history = []
+    ranks = np.full(N, 1 / N)
+    previous = []
+    upcoming = None
+
+    for iteration in range(1, max_iterations + 1):
+        if method == "gauss-seidel":
+            values = ranks.tolist()
+            base = ((1 - damping_factor) / N + damping_factor
+                    * sum(values[i] for i in dangling_pages) / N)
+            for page in range(N):
+                values[page] = base + damping_factor * sum(
+                    values[link] * inverse_degree[link]
+                    for link in in_links[page]
+                )
+            new_ranks = np.array(values)
+            new_ranks /= new_ranks.sum()
+        elif upcoming is not None:
+            new_ranks, upcoming = upcoming, None
         else:
-            lower_limit += prob
+            new_ranks = power_step(ranks)
+
+        if method == "aitken":
+            previous = (previous + [new_ranks])[-3:]
+            if len(previous) == 3 and iteration % AITKEN_PERIOD == 0:
+                # only jump to the extrapolation if it is closer to the
+                # fixed point than the plain step, judged by the residual
+                # of one more step from each, which is kept as the next
+                # iteration
+                extrapolated = aitken_extrapolate(*previous)
+                after_extrapolated = power_step(extrapolated)
+                upcoming = power_step(new_ranks)
+                if (np.abs(after_extrapolated - extrapolated).sum()
+                        < np.abs(upcoming - new_ranks).sum()):
+                    new_ranks, upcoming = extrapolated, after_extrapolated
+                    previous = [new_ranks]
+
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        history.append({
+            "iteration": iteration,
+            "residual": float(residual),
+            "seconds": time.perf_counter() - start
+        })
+        if residual < tolerance:
+            break
+
+    return dict(zip(pages, ranks.tolist())), history
+
+
+def aitken_extrapolate(first, second, third):
+    """
+    Return the Aitken delta-squared extrapolation of three successive
+    rank vectors, renormalized to sum to 1. Components whose second
+    difference vanishes keep their latest value.
+    """
+    step = third - second
+    curvature = third - 2 * second + first
+    with np.errstate(divide="ignore", invalid="ignore"):
+        extrapolated = third - step ** 2 / curvature
+    extrapolated = np.where(
+        (np.abs(curvature) > 1e-15) & (extrapolated > 0),
+        extrapolated, third
+    )
+    return extrapolated / extrapolated.sum()
+
+
+def sample_pagerank_batched(corpus, damping_factor, n, surfers=1000,
+                            seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages with
+    `surfers` independent random surfers advanced together, each starting
+    on a page at random.
+
+    Each step, a surfer follows one of its page's links at random with
+    probability `damping_factor` and otherwise jumps to a page chosen at
+    random from the whole corpus; pages with no links always jump. Pass
+    `seed` for reproducible results.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value. All PageRank values sum to 1.
+    """
+    pages, indptr, indices, out_degree = compile_corpus(corpus)
+    rng = np.random.default_rng(seed)
+    N = len(pages)
+    surfers = max(1, min(surfers, n))
+
+    counts = np.zeros(N, dtype=np.int64)
+    current = rng.integers(N, size=surfers)
+    remaining = n
+    while remaining > 0:
+        degree = out_degree[current]
+        follow = (rng.random(surfers) < damping_factor) & (degree > 0)
+        offset = (rng.random(surfers) * degree).astype(np.int64)
+        jump = rng.integers(N, size=surfers)
+        # surfers on pages with no links never follow, so clamp their
+        # lookup into the link array to any valid position
+        position = np.where(follow, indptr[current] + offset, 0)
+        current = jump if not len(indices) else np.where(
+            follow, indices[position], jump
+        )
+
+        # only count as many surfers as there are samples left
+        counted = current[:remaining]
+        counts += np.bincount(counted, minlength=N)
+        remaining -= len(counted)
+
+    return dict(zip(pages, (counts / n).tolist()))
+
+
+def corpus_delta(old_corpus, corpus):
+    """
+    Return the difference between two `crawl()` dictionaries as a
+    dictionary with `added_pages` and `removed_pages` sets of page names,
+    and `added_links` and `removed_links` sets of `(source, target)` pairs.
+    """
+    added_links, removed_links = set(), set()
+    for page in set(old_corpus) | set(corpus):
+        old_links = old_corpus.get(page, set())
+        new_links = corpus.get(page, set())
+        added_links.update((page, link) for link in new_links - old_links)
+        removed_links.update((page, link) for link in old_links - new_links)
+    return {
+        "added_pages": set(corpus) - set(old_corpus),
+        "removed_pages": set(old_corpus) - set(corpus),
+        "added_links": added_links,
+        "removed_links": removed_links
+    }
+
+
+class IncrementalPageRank():
+    """
+    PageRank values of a corpus, kept up to date as the corpus changes.
+
+    The corpus is compiled once into a sparse adjacency, as in
+    `compile_corpus`. Each update searches only the rows of pages that
+    lost links, inserts new links at the end of their rows, and restarts
+    vectorized power iteration from the previous rank vector, so neither
+    the corpus is compiled again nor the iteration restarted from a
+    uniform `1/N`. Pages with no links are interpreted as linking to
+    every page, as in `iterate_pagerank_sparse`.
+    """
+
+    def __init__(self, corpus, damping_factor, tolerance=1e-8,
+                 max_iterations=1000):
+        self.damping_factor = damping_factor
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.pages, self.indptr, self.indices, self.out_degree = (
+            compile_corpus(corpus)
+        )
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        self.vector = None
+        self.ranks = self.solve()
+
+    def update(self, delta):
+        """
+        Apply a change to the corpus described by `delta`, as returned by
+        `corpus_delta`, and return the new PageRank values as a dictionary.
+        Every link from or to a removed page must be listed in
+        `removed_links`.
+        """
+        old_count = len(self.pages)
+        for page in sorted(set(delta["added_pages"]) - self.index.keys()):
+            self.index[page] = len(self.pages)
+            self.pages.append(page)
+        N = len(self.pages)
+        indices = self.indices
+        out_degree = np.concatenate([
+            self.out_degree, np.zeros(N - old_count, dtype=np.int64)
+        ])
+        removed_sources, removed_targets = self.link_arrays(
+            delta["removed_links"]
+        )
+        added_sources, added_targets = self.link_arrays(delta["added_links"])
+
+        # only the rows of pages that lost links are searched for them,
+        # comparing links as single integers `source * N + target`
+        if len(removed_sources):
+            rows = np.unique(removed_sources)
+            counts = self.out_degree[rows]
+            positions = (np.repeat(self.indptr[rows] - np.cumsum(counts)
+                                   + counts, counts)
+                         + np.arange(counts.sum()))
+            sources = np.repeat(rows, counts)
+            dropped = np.isin(sources * N + indices[positions],
+                              removed_sources * N + removed_targets)
+            indices = np.delete(indices, positions[dropped])
+            out_degree -= np.bincount(sources[dropped], minlength=N)
+
+        # added links go at the end of their source's row, in order of
+        # source since empty rows share the same end
+        if len(added_sources):
+            order = np.argsort(added_sources, kind="stable")
+            added_sources = added_sources[order]
+            added_targets = added_targets[order]
+            row_ends = np.cumsum(out_degree)
+            indices = np.insert(indices, row_ends[added_sources],
+                                added_targets)
+            out_degree += np.bincount(added_sources, minlength=N)
+
+        # new pages start from the average rank
+        start = np.concatenate([self.vector,
+                                np.full(N - old_count, 1 / max(N, 1))])
 
+        removed_pages = [self.index[page] for page in delta["removed_pages"]
+                         if page in self.index]
+        if removed_pages:
+            kept = np.ones(N, dtype=bool)
+            kept[removed_pages] = False
+            renumber = np.cumsum(kept) - 1
+            indices = renumber[indices]
+            out_degree = out_degree[kept]
+            start = start[kept]
+            self.pages = [page for page, keep in zip(self.pages,
+                                                     kept.tolist()) if keep]
+            self.index = {page: i for i, page in enumerate(self.pages)}
+
+        self.indices, self.out_degree = indices, out_degree
+        self.indptr = np.zeros(len(self.pages) + 1, dtype=np.int64)
+        np.cumsum(out_degree, out=self.indptr[1:])
+        self.ranks = self.solve(start)
+        return self.ranks
+
+    def link_arrays(self, links):
+        """
+        Return arrays of the source and target page indices of `links`,
+        skipping links to the same page or to pages not in the corpus.
+        """
+        links = [(self.index[source], self.index[target])
+                 for source, target in links if source != target
+                 and source in self.index and target in self.index]
+        links = np.array(links, dtype=np.int64).reshape(-1, 2)
+        return links[:, 0], links[:, 1]
+
+    def solve(self, start=None):
+        """
+        Run power iteration from `start`, or from a uniform vector, and
+        return the PageRank values as a dictionary.
+        """
+        if start is not None and start.sum() > 0:
+            start = start / start.sum()
+        self.vector = power_iterate(self.indptr, self.indices,
+                                    self.out_degree, self.damping_factor,
+                                    self.tolerance, self.max_iterations,
+                                    start)
+        return dict(zip(self.pages, self.vector.tolist()))
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -205,6 +1049,80 @@ def compare_answers(old, new, tolerance):
     return True
 
 
+def compile_corpus(corpus):
+    """
+    Compile a `crawl()` dictionary into a compressed sparse row adjacency.
+
+    Return a tuple `(pages, indptr, indices, out_degree)` where `pages` is
+    a sorted list of page names, and the links of `pages[i]` are the page
+    indices `indices[indptr[i]:indptr[i + 1]]`. `out_degree[i]` is the
+    number of distinct links on `pages[i]`.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+
+    out_degree = np.zeros(len(pages), dtype=np.int64)
+    links = []
+    for i, page in enumerate(pages):
+        # duplicate links and links from a page to itself are ignored
+        targets = sorted(index[link] for link in set(corpus[page])
+                         if link != page and link in index)
+        out_degree[i] = len(targets)
+        links.extend(targets)
+
+    indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum(out_degree, out=indptr[1:])
+    indices = np.array(links, dtype=np.int64)
+    return pages, indptr, indices, out_degree
+
+
+def iterate_pagerank_sparse(corpus, damping_factor, tolerance=1e-8,
+                            max_iterations=1000):
+    """
+    Return PageRank values for each page using vectorized power iteration
+    over a sparse adjacency compiled from `corpus`.
+
+    A page with no links is interpreted as having one link to every page
+    in the corpus (including itself), as in `transition_model`. Iteration
+    stops once the L1 distance between successive rank vectors is below
+    `tolerance`, or after `max_iterations` rounds.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value. All PageRank values sum to 1.
+    """
+    pages, indptr, indices, out_degree = compile_corpus(corpus)
+    ranks = power_iterate(indptr, indices, out_degree, damping_factor,
+                          tolerance, max_iterations)
+    return dict(zip(pages, ranks.tolist()))
+
+
+def power_iterate(indptr, indices, out_degree, damping_factor,
+                  tolerance=1e-8, max_iterations=1000, ranks=None):
+    """
+    Run PageRank power iteration on a compiled adjacency, starting from
+    the rank vector `ranks` if given, and return the rank vector as a
+    NumPy array.
+    """
+    N = len(out_degree)
+    dangling = out_degree == 0
+    # each page's share of its rank is repeated once per outgoing edge
+    safe_degree = np.where(dangling, 1, out_degree)
+    if ranks is None:
+        ranks = np.full(N, 1 / N)
+
+    for _ in range(max_iterations):
+        shares = np.repeat(ranks / safe_degree, out_degree)
+        new_ranks = np.bincount(indices, weights=shares, minlength=N)
+        dangling_mass = ranks[dangling].sum()
+        new_ranks = (damping_factor * (new_ranks + dangling_mass / N)
+                     + (1 - damping_factor) / N)
+        new_ranks /= new_ranks.sum()
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if residual < tolerance:
+            break
+    return ranks
+
 
 if __name__ == "__main__":
     main()